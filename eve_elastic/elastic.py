@@ -1,14 +1,23 @@
 import ast
+import copy
 import types
-import arrow
 import ciso8601
-import pytz  # NOQA
 import logging
 import elasticsearch
 import time
+import threading
 
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
 from bson import ObjectId
-from elasticsearch.helpers import bulk, reindex  # noqa: F401
+from elasticsearch.helpers import (  # noqa: F401
+    bulk,
+    parallel_bulk,
+    reindex,
+    streaming_bulk,
+    BulkIndexError,
+)
 
 from click import progressbar
 from uuid import uuid4
@@ -18,29 +27,146 @@ from eve.io.base import DataLayer
 from eve.io.mongo.parser import parse, ParseError
 from elasticsearch import Elasticsearch
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
 
 logging.basicConfig()
 logger = logging.getLogger("elastic")
 
 RESOURCE_FIELD = "_resource"
 
+# search params which go to msearch header instead of body
+MSEARCH_HEADER_PARAMS = (
+    "allow_no_indices",
+    "allow_partial_search_results",
+    "expand_wildcards",
+    "ignore_unavailable",
+    "preference",
+    "request_cache",
+    "routing",
+    "search_type",
+)
+
+# search params which are named differently in msearch body
+MSEARCH_BODY_PARAMS = {"from_": "from"}
+
+# search params which can only be sent as url params, not in msearch body
+MSEARCH_URL_PARAMS = (
+    "_source_excludes",
+    "_source_includes",
+    "analyze_wildcard",
+    "analyzer",
+    "batched_reduce_size",
+    "ccs_minimize_roundtrips",
+    "default_operator",
+    "df",
+    "ignore_throttled",
+    "lenient",
+    "max_concurrent_shard_requests",
+    "pre_filter_shard_size",
+    "q",
+    "rest_total_hits_as_int",
+    "scroll",
+    "sort",
+    "suggest_field",
+    "suggest_mode",
+    "suggest_size",
+    "suggest_text",
+    "typed_keys",
+)
+
+# client options which are not sent to elastic
+TRANSPORT_PARAMS = (
+    "api_key",
+    "headers",
+    "http_auth",
+    "ignore",
+    "opaque_id",
+    "request_timeout",
+)
+
+# index api params which are set per action in bulk requests
+BULK_ACTION_PARAMS = {
+    "if_primary_term": "if_primary_term",
+    "if_seq_no": "if_seq_no",
+    "op_type": "_op_type",
+    "pipeline": "pipeline",
+    "routing": "routing",
+    "version": "version",
+    "version_type": "version_type",
+}
+
+# index settings used while bulk loading data
+BULK_INDEXING_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def get_bulk_indexing_settings(settings):
+    """Get values of bulk indexing settings from configured index settings.
+
+    Settings which are not configured are ``None`` so elastic uses defaults.
+
+    :param settings: index settings as configured for resource
+    """
+    settings = (settings or {}).get("settings", {})
+    index_settings = settings.get("index", {})
+    return {
+        key: index_settings.get(key, settings.get(key, settings.get("index." + key)))
+        for key in BULK_INDEXING_SETTINGS
+    }
+
 
 def json_dumps(data):
     return json.dumps(data, indent=2, default=ElasticJSONSerializer().default)
 
 
+DATE_PARSERS = (datetime.fromisoformat, ciso8601.parse_datetime)
+DATE_FORMATS = ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z")
+
+# parser which handled the last date, elastic returns dates in the same format
+_last_date_parser = [DATE_PARSERS[0]]
+
+
 def parse_date(date_str):
     """Parse elastic datetime string."""
     if not date_str:
         return None
 
+    if not isinstance(date_str, str):  # list of values for stored fields
+        date_str = date_str[0]
+
+    last_parser = _last_date_parser[0]
     try:
-        date = ciso8601.parse_datetime(date_str)
-        if not date:
-            date = arrow.get(date_str).datetime
-    except TypeError:
-        date = arrow.get(date_str[0]).datetime
-    return date
+        date = last_parser(date_str)
+    except ValueError:
+        date = None
+    if date:
+        return date
+
+    for parser in DATE_PARSERS:
+        if parser is last_parser:
+            continue
+        try:
+            date = parser(date_str)
+        except ValueError:
+            continue
+        if date:
+            _last_date_parser[0] = parser
+            return date
+
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format)
+        except ValueError:
+            continue
+
+    import arrow  # slow to import and only needed for unusual formats
+
+    return arrow.get(date_str).datetime
 
 
 def get_dates(schema):
@@ -57,35 +183,46 @@ def format_doc(hit, schema, dates):
     doc = hit.get("_source", {})
     doc.setdefault(config.ID_FIELD, hit.get("_id"))
     doc["_type"] = doc.pop(RESOURCE_FIELD)
-    if hit.get("highlight"):
-        doc["es_highlight"] = hit.get("highlight")
 
-    if hit.get("inner_hits"):
-        doc["_inner_hits"] = {}
-        for key, value in hit.get("inner_hits").items():
-            doc["_inner_hits"][key] = []
-            for item in value.get("hits", {}).get("hits", []):
-                doc["_inner_hits"][key].append(item.get("_source", {}))
+    highlight = hit.get("highlight")
+    if highlight:
+        doc["es_highlight"] = highlight
+
+    inner_hits = hit.get("inner_hits")
+    if inner_hits:
+        doc["_inner_hits"] = {
+            key: [
+                item.get("_source", {})
+                for item in value.get("hits", {}).get("hits", [])
+            ]
+            for key, value in inner_hits.items()
+        }
 
     for key in dates:
-        if key in doc:
-            doc[key] = parse_date(doc[key])
+        value = doc.get(key)
+        if value is not None:
+            doc[key] = parse_date(value)
 
     return doc
 
 
 def test_settings_contain(current_settings, new_settings):
     """Test if current settings contain everything from new settings."""
-    try:
-        for key, val in new_settings.items():
+    stack = [(current_settings, new_settings)]
+    while stack:
+        current, new = stack.pop()
+        if not new:
+            continue
+        if not isinstance(current, dict):
+            return False
+        for key, val in new.items():
+            if key not in current:
+                return False
             if isinstance(val, dict):
-                if not test_settings_contain(current_settings[key], val):
-                    return False
-            elif val != current_settings[key]:
+                stack.append((current[key], val))
+            elif val != current[key]:
                 return False
-        return True
-    except KeyError:
-        return False
+    return True
 
 
 def noop(*args):
@@ -244,7 +381,7 @@ def fix_query(query, top=True, context=None):
         new_query["query"].setdefault("bool", {})
         merge_queries(new_query["query"]["bool"], "filter", filter_)
 
-    if top:
+    if top and logger.isEnabledFor(logging.DEBUG):
         logger.debug(
             "query %s fixed %s",
             json.dumps(query, indent=2, default=ElasticJSONSerializer().default),
@@ -277,20 +414,69 @@ class ElasticJSONSerializer(elasticsearch.JSONSerializer):
             return str(value)
         return super(ElasticJSONSerializer, self).default(value)
 
+    if orjson is not None:
+
+        def dumps(self, data):
+            """Serialize data using orjson.
+
+            Data orjson can't handle, like ints over 64 bits, is serialized
+            using stdlib json. Unlike stdlib json orjson serializes ``nan``
+            and ``inf`` floats as ``null``.
+            """
+            if isinstance(data, elasticsearch.compat.string_types):
+                return data
+
+            try:
+                return orjson.dumps(
+                    data,
+                    default=self.default,
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                ).decode()
+            except orjson.JSONEncodeError:
+                return super(ElasticJSONSerializer, self).dumps(data)
+
+        def loads(self, s):
+            """Deserialize data using orjson."""
+            try:
+                return orjson.loads(s)
+            except (ValueError, TypeError) as e:
+                raise elasticsearch.SerializationError(s, e)
+
 
 class ElasticCursor(object):
-    """Search results cursor."""
+    """Search results cursor.
+
+    When ``parse`` callback is set docs are parsed from hits on first access.
+    """
 
     no_hits = {"hits": {"total": 0, "hits": []}}
 
-    def __init__(self, hits=None, docs=None):
+    def __init__(self, hits=None, docs=None, parse=None):
         """Parse hits into docs."""
         self.hits = hits if hits else self.no_hits
-        self.docs = docs if docs else []
+        self._docs = docs
+        self._parse = parse
+
+    @property
+    def docs(self):
+        """Get docs, parse hits if not parsed yet."""
+        if self._docs is None and self._parse is not None:
+            hits = self.hits.get("hits", {}).get("hits", ())
+            self._docs = [self._parse(hit) for hit in hits]
+        elif self._docs is None:
+            self._docs = []
+        return self._docs
+
+    @docs.setter
+    def docs(self, docs):
+        self._docs = docs
 
     def __getitem__(self, key):
         return self.docs[key]
 
+    def __iter__(self):
+        return iter(self.docs)
+
     def first(self):
         """Get first doc."""
         return self.docs[0] if self.docs else None
@@ -314,6 +500,45 @@ class ElasticCursor(object):
             response["_aggregations"] = self.hits["aggregations"]
 
 
+class BatchedCursor(ElasticCursor):
+    """Search results cursor filled when batched searches are sent.
+
+    Reading it before that raises ``RuntimeError``.
+    """
+
+    def __init__(self):
+        super(BatchedCursor, self).__init__()
+        self._filled = False
+
+    def fill(self, cursor):
+        """Use hits from given cursor."""
+        self.hits = cursor.hits
+        self._parse = cursor._parse
+        self._docs = None
+        self._filled = True
+
+    def _check_filled(self):
+        if not self._filled:
+            raise RuntimeError("batched search results are not available yet")
+
+    @property
+    def docs(self):
+        self._check_filled()
+        return super(BatchedCursor, self).docs
+
+    @docs.setter
+    def docs(self, docs):
+        self._docs = docs
+
+    def count(self, **kwargs):
+        self._check_filled()
+        return super(BatchedCursor, self).count(**kwargs)
+
+    def extra(self, response):
+        self._check_filled()
+        return super(BatchedCursor, self).extra(response)
+
+
 def set_filters(query, filters):
     """Put together all filters we have and set them as 'and' filter
     within filtered query.
@@ -329,10 +554,7 @@ def set_filters(query, filters):
 
 
 def set_sort(query, sort):
-    query["sort"] = []
-    for key, sortdir in sort:
-        sort_dict = dict([(key, "asc" if sortdir > 0 else "desc")])
-        query["sort"].append(sort_dict)
+    query["sort"] = [{key: "asc" if sortdir > 0 else "desc"} for key, sortdir in sort]
 
 
 def get_es(url, **kwargs) -> Elasticsearch:
@@ -362,6 +584,14 @@ class Elastic(DataLayer):
         self.index = None
         self.kwargs = kwargs
         self.elastics = {}
+        self._parse_cache = {}
+        self._index_cache = {}
+        self._parent_cache = {}
+        self._mapping_cache = {}
+        self._args_cache = {}
+        self._elastic_resources = None
+        self._batch = threading.local()
+        self._bulk_indexing_settings = {}
         super(Elastic, self).__init__(app)
 
     def init_app(self, app):
@@ -374,6 +604,11 @@ class Elastic(DataLayer):
         app.config.setdefault("ELASTICSEARCH_TRACK_TOTAL_HITS", 10000)
         app.config.setdefault("ELASTICSEARCH_FIX_QUERY", True)
         app.config.setdefault("ELASTICSEARCH_FIX_MAPPING", True)
+        app.config.setdefault("ELASTICSEARCH_BULK_CHUNK_SIZE", 500)
+        app.config.setdefault("ELASTICSEARCH_BULK_MAX_BYTES", 10 * 1024 * 1024)
+        app.config.setdefault("ELASTICSEARCH_BULK_REFRESH", True)
+        app.config.setdefault("ELASTICSEARCH_BULK_THREADS", 4)
+        app.config.setdefault("ELASTICSEARCH_LAZY_DATES", False)
 
         self.app = app
         self.index = app.config["ELASTICSEARCH_INDEX"]
@@ -381,6 +616,7 @@ class Elastic(DataLayer):
 
     def init_index(self, resource=None, raise_on_mapping_error=False):
         """Create indexes and put mapping."""
+        self.clear_resource_caches()
         for _resource in self._get_elastic_resources():
             if resource and _resource != resource:
                 continue
@@ -457,6 +693,11 @@ class Elastic(DataLayer):
         es.indices.create(**args)
 
     def _get_elastic_resources(self):
+        if self._elastic_resources is None:
+            self._elastic_resources = self._find_elastic_resources()
+        return self._elastic_resources
+
+    def _find_elastic_resources(self):
         elastic_resources = {}
         for resource in app.config["DOMAIN"]:
             try:
@@ -477,10 +718,15 @@ class Elastic(DataLayer):
         return elastic_resources
 
     def _resource_mapping(self, resource):
+        try:
+            return self._mapping_cache[resource]
+        except KeyError:
+            pass
         resource_config = app.config["DOMAIN"][resource]
         properties = self._get_mapping_properties(
             resource_config, parent=self._get_parent_type(resource)
         )
+        self._mapping_cache[resource] = properties
         return properties
 
     def _get_mapping_properties(self, resource_config, parent=None):
@@ -557,14 +803,18 @@ class Elastic(DataLayer):
         source_config = app.config["DOMAIN"][resource]["datasource"]
 
         if args.get("source"):
-            query = json.loads(args.get("source"))
-            query.setdefault("query", {})
-            must = []
-            for key, val in query["query"].items():
-                if key != "bool":
-                    must.append({key: val})
-            if must:
-                query["query"] = {"bool": {"must": must}}
+            query = json_loads(args.get("source"))
+            source_query = query.setdefault("query", {})
+            if any(key != "bool" for key in source_query):  # wrap non bool query
+                query["query"] = {
+                    "bool": {
+                        "must": [
+                            {key: val}
+                            for key, val in source_query.items()
+                            if key != "bool"
+                        ]
+                    }
+                }
         else:
             query = {"query": {"bool": {}}}
 
@@ -598,16 +848,14 @@ class Elastic(DataLayer):
             except TypeError:
                 filters.append(source_config["elastic_filter_callback"]())
         filters.append(
-            {"bool": {"must": _build_lookup_filter(sub_resource_lookup)}}
-            if sub_resource_lookup
-            else None
+            _build_lookup_query(sub_resource_lookup) if sub_resource_lookup else None
         )
-        filters.append(json.loads(args.get("filter")) if "filter" in args else None)
+        filters.append(json_loads(args.get("filter")) if "filter" in args else None)
         filters.extend(args.get("filters") if "filters" in args else [])
 
         if req.where:
             try:
-                filters.append({"term": json.loads(req.where)})
+                filters.append({"term": json_loads(req.where)})
             except ValueError:
                 try:
                     filters.append({"term": parse(req.where)})
@@ -716,8 +964,7 @@ class Elastic(DataLayer):
             )
         else:
             args = self._es_args(resource)
-            filters = [{"term": {key: val}} for key, val in lookup.items()]
-            query = {"query": {"bool": {"must": filters}}}
+            query = {"query": _build_lookup_query(lookup)}
 
             try:
                 args["size"] = 1
@@ -787,18 +1034,60 @@ class Elastic(DataLayer):
                 return doc
 
     def insert(self, resource, doc_or_docs, **kwargs):
-        """Insert document, it must be new if there is ``_id`` in it."""
-        ids = []
+        """Insert document, it must be new if there is ``_id`` in it.
+
+        Multiple documents are indexed using bulk api.
+        """
         es_args = self._es_args(resource)
         es_args.update(kwargs)
-        for doc in doc_or_docs:
+        if len(doc_or_docs) == 1:
+            doc = doc_or_docs[0]
             _id = doc.pop("_id", None)
             body = self._prepare_for_storage(resource, doc, es_args)
             res = self.elastic(resource).index(body=body, id=_id, **es_args)
             doc.setdefault("_id", res.get("_id", _id))
-            ids.append(doc.get("_id"))
+        else:
+            self._bulk_index(resource, doc_or_docs, es_args)
         self._refresh_resource_index(resource)
-        return ids
+        return [doc.get("_id") for doc in doc_or_docs]
+
+    def _bulk_index(self, resource, docs, es_args):
+        """Index docs using bulk api and set generated ids on docs."""
+        es_args = es_args.copy()
+        action_args = {
+            BULK_ACTION_PARAMS[key]: es_args.pop(key)
+            for key in list(es_args)
+            if key in BULK_ACTION_PARAMS
+        }
+        actions = []
+        for doc in docs:
+            _id = doc.get("_id")
+            args = {}
+            action = {"_source": self._prepare_for_storage(resource, doc, args)}
+            action.update(action_args)
+            if _id is not None:
+                action["_id"] = _id
+            if args.get("parent"):
+                action["_parent"] = args["parent"]
+            actions.append(action)
+
+        errors = []
+        results = streaming_bulk(
+            self.elastic(resource),
+            actions,
+            raise_on_error=False,
+            **self._bulk_args(resource, es_args),
+        )
+        for doc, (ok, item) in zip(docs, results):
+            result = next(iter(item.values()))  # keyed by op type
+            doc.setdefault("_id", result.get("_id"))
+            if not ok:
+                errors.append(item)
+
+        if errors:
+            raise BulkIndexError(
+                "%i document(s) failed to index." % len(errors), errors
+            )
 
     def bulk_insert(self, resource, docs, **kwargs):
         """Bulk insert documents."""
@@ -813,13 +1102,77 @@ class Elastic(DataLayer):
             if doc.get("_id"):
                 action["_id"] = doc["_id"]
             actions.append(action)
-        res = bulk(self.elastic(resource), actions, stats_only=False, **kwargs)
-        self._refresh_resource_index(resource)
+
+        es = self.elastic(resource)
+        bulk_args = self._bulk_args(resource, kwargs)
+        threads = self._resource_config(resource, "BULK_THREADS", 4)
+        if threads > 1 and len(actions) > bulk_args["chunk_size"]:
+            success, errors = 0, []
+            for ok, item in parallel_bulk(
+                es,
+                actions,
+                thread_count=threads,
+                queue_size=threads * 2,
+                **bulk_args,
+            ):
+                if ok:
+                    success += 1
+                else:
+                    errors.append(item)
+            res = success, errors
+        else:
+            res = bulk(es, actions, stats_only=False, **bulk_args)
+
+        if self._resource_config(resource, "BULK_REFRESH", True):
+            self._refresh_resource_index(resource)
         return res
 
+    def _bulk_args(self, resource, kwargs):
+        """Get bulk helper args using resource config for chunking."""
+        args = {
+            "chunk_size": self._resource_config(resource, "BULK_CHUNK_SIZE", 500),
+            "max_chunk_bytes": self._resource_config(
+                resource, "BULK_MAX_BYTES", 10 * 1024 * 1024
+            ),
+        }
+        args.update(kwargs)
+        return args
+
+    def set_bulk_indexing_mode(self, resource, enabled=True):
+        """Tune resource index for bulk loading.
+
+        When enabled it disables refresh and replicas, when disabled
+        it restores previous values, or configured values if it was
+        enabled in another process.
+
+        :param resource: resource name
+        :param enabled: enable or disable bulk indexing mode
+        """
+        self._set_bulk_indexing_mode(
+            self.elastic(resource),
+            self._resource_index(resource),
+            enabled,
+            self._resource_config(resource, "SETTINGS"),
+        )
+
+    def _set_bulk_indexing_mode(self, es, index, enabled, settings=None):
+        if enabled:
+            current = es.indices.get_settings(index=index)
+            current = next(iter(current.values()))["settings"]["index"]
+            self._bulk_indexing_settings.setdefault(
+                index, {key: current.get(key) for key in BULK_INDEXING_SETTINGS}
+            )
+            settings = BULK_INDEXING_SETTINGS
+        else:
+            try:
+                settings = self._bulk_indexing_settings.pop(index)
+            except KeyError:
+                settings = get_bulk_indexing_settings(settings)
+        es.indices.put_settings(index=index, body={"index": settings})
+
     def update(self, resource, id_, updates):
         """Update document in index."""
-        args = self._es_args(resource, refresh=True)
+        args = self._es_args(resource, refresh=self._force_refresh(resource))
         if self._get_retry_on_conflict():
             args["retry_on_conflict"] = self._get_retry_on_conflict()
         doc = self._prepare_for_storage(resource, updates, args)
@@ -827,7 +1180,7 @@ class Elastic(DataLayer):
 
     def replace(self, resource, id_, document):
         """Replace document in index."""
-        args = self._es_args(resource, refresh=True)
+        args = self._es_args(resource, refresh=self._force_refresh(resource))
         doc = self._prepare_for_storage(resource, document, args)
         return self.elastic(resource).index(body=doc, id=id_, **args)
 
@@ -846,16 +1199,14 @@ class Elastic(DataLayer):
         :param lookup: filter
         :param parent: parent id
         """
-        kwargs.update(self._es_args(resource))
+        kwargs.update(self._es_args(resource, refresh=self._force_refresh(resource)))
         if parent:
             kwargs["parent"] = parent
 
         if lookup:
             if lookup.get("_id"):
                 try:
-                    return self.elastic(resource).delete(
-                        id=lookup.get("_id"), refresh=True, **kwargs
-                    )
+                    return self.elastic(resource).delete(id=lookup.get("_id"), **kwargs)
                 except elasticsearch.NotFoundError:
                     return
         return ValueError("there must be `lookup._id` specified")
@@ -897,19 +1248,49 @@ class Elastic(DataLayer):
 
     def _parse_hits(self, hits, resource):
         """Parse hits response into documents."""
+        schema, dates = self._get_schema_dates(resource)
+        if self._resource_config(resource, "LAZY_DATES", False):
+            dates = (config.LAST_UPDATED, config.DATE_CREATED)
+        return ElasticCursor(hits, parse=lambda hit: format_doc(hit, schema, dates))
+
+    def _get_schema_dates(self, resource):
+        """Get merged schema and list of date fields for given resource.
+
+        It's computed on first use and cached till schema cache is invalidated.
+
+        :param resource: resource name
+        """
+        try:
+            return self._parse_cache[resource]
+        except KeyError:
+            pass
         datasource = self.get_datasource(resource)
         schema = {}
         schema.update(app.config["DOMAIN"][datasource[0]].get("schema", {}))
         schema.update(app.config["DOMAIN"][resource].get("schema", {}))
-        dates = get_dates(schema)
-        docs = []
-        for hit in hits.get("hits", {}).get("hits", []):
-            docs.append(format_doc(hit, schema, dates))
-        return ElasticCursor(hits, docs)
+        self._parse_cache[resource] = schema, tuple(get_dates(schema))
+        return self._parse_cache[resource]
+
+    def invalidate_schema_cache(self):
+        """Drop cached resource schemas, use it after changing ``DOMAIN``."""
+        self._parse_cache.clear()
+
+    def clear_resource_caches(self):
+        """Drop cached resource config, use it after changing ``DOMAIN`` or indexes."""
+        self.invalidate_schema_cache()
+        self._index_cache.clear()
+        self._parent_cache.clear()
+        self._mapping_cache.clear()
+        self._args_cache.clear()
+        self._elastic_resources = None
 
     def _es_args(self, resource, refresh=None, source_projections=None):
         """Get index and doctype args."""
-        args = {"index": self._resource_index(resource)}
+        try:
+            args = self._args_cache[resource].copy()
+        except KeyError:
+            self._args_cache[resource] = {"index": self._resource_index(resource)}
+            args = self._args_cache[resource].copy()
 
         if source_projections:
             args["_source"] = ",".join(
@@ -922,8 +1303,14 @@ class Elastic(DataLayer):
         return args
 
     def _get_parent_type(self, resource):
+        try:
+            return self._parent_cache[resource]
+        except KeyError:
+            pass
         resource_config = app.config["DOMAIN"][resource] or {}
-        return resource_config.get("datasource", {}).get("elastic_parent", {})
+        parent_type = resource_config.get("datasource", {}).get("elastic_parent", {})
+        self._parent_cache[resource] = parent_type
+        return parent_type
 
     def get_parent_id(self, resource, document):
         """Get the Parent Id of the document
@@ -962,21 +1349,39 @@ class Elastic(DataLayer):
 
         :param resource: resource name
         """
+        try:
+            return self._index_cache[resource]
+        except KeyError:
+            pass
         datasource = self.get_datasource(resource)
         indexes = self._resource_config(resource, "INDEXES") or {}
         default_index = "{}_{}".format(
             self._resource_config(resource, "INDEX"), datasource[0]
         )
-        return indexes.get(datasource[0], default_index)
+        index = indexes.get(datasource[0], default_index)
+        self._index_cache[resource] = index
+        return index
 
     def _refresh_resource_index(self, resource, force=False):
         """Refresh index for given resource.
 
         :param resource: resource name
         """
-        if self._resource_config(resource, "FORCE_REFRESH", True) or force:
+        if self._force_refresh(resource) or force:
             self.elastic(resource).indices.refresh(self._resource_index(resource))
 
+    def refresh_index(self, resource):
+        """Refresh index for given resource even if ``FORCE_REFRESH`` is off.
+
+        Use it after multiple modifications done with ``ELASTICSEARCH_FORCE_REFRESH=False``.
+
+        :param resource: resource name
+        """
+        self._refresh_resource_index(resource, force=True)
+
+    def _force_refresh(self, resource):
+        return self._resource_config(resource, "FORCE_REFRESH", True)
+
     def _resource_prefix(self, resource=None):
         """Get elastic prefix for given resource.
 
@@ -1035,14 +1440,113 @@ class Elastic(DataLayer):
 
         if isinstance(resources, str):
             resources = resources.split(",")
-        index = [self._resource_index(resource) for resource in resources]
-        try:
-            hits = self.elastic(resources[0]).search(
-                body=fix_query(query), index=index, **params
+
+        batch = getattr(self._batch, "queries", None)
+        if batch is not None and not any(key in MSEARCH_URL_PARAMS for key in params):
+            cursor = BatchedCursor()
+            # copy so later changes made by caller don't affect queued search
+            batch.append(
+                (resources, copy.deepcopy(query), copy.deepcopy(params), cursor)
             )
-            return self._parse_hits(hits, resources[0])
-        except elasticsearch.exceptions.RequestError:
-            raise
+            return cursor
+
+        resource = resources[0]
+        if len(resources) == 1:
+            index = self._resource_index(resource)
+        else:
+            index = [self._resource_index(name) for name in resources]
+        hits = self.elastic(resource).search(
+            body=fix_query(query), index=index, **params
+        )
+        return self._parse_hits(hits, resource)
+
+    @contextmanager
+    def batched(self):
+        """Send searches made within the block using single msearch request.
+
+        Cursors returned by :meth:`search` are filled when the block exits,
+        reading them before that raises ``RuntimeError``. Searches using params which
+        msearch doesn't support are sent right away.
+
+        Transport options like ``request_timeout`` apply to the whole msearch
+        request, if searches use different values the last one is used.
+        """
+        if getattr(self._batch, "queries", None) is not None:
+            yield
+            return
+        batch = self._batch.queries = []
+        try:
+            yield
+        finally:
+            self._batch.queries = None
+        results = self.msearch(
+            [(resources, query, params) for resources, query, params, _ in batch]
+        )
+        for (_, _, _, cursor), result in zip(batch, results):
+            cursor.fill(result)
+
+    def msearch(self, queries):
+        """Run multiple searches using single request.
+
+        All resources must use same elastic instance. Search params are moved
+        to msearch header or body, params which are only valid as url params
+        raise ``ValueError``.
+
+        :param queries: list of ``(resources, query)`` or ``(resources, query, params)`` tuples
+        :returns: list of cursors in same order as queries
+        """
+        body = []
+        parse_resources = []
+        transport = {}
+        for resources, query, *params in queries:
+            if isinstance(resources, str):
+                resources = resources.split(",")
+            header = {
+                "index": [self._resource_index(resource) for resource in resources]
+            }
+            search = self._get_default_search_params()
+            if params and params[0]:
+                search.update(params[0])
+            for key in search:
+                if key in MSEARCH_URL_PARAMS:
+                    raise ValueError(
+                        "search param {} is not supported by msearch".format(key)
+                    )
+            for key in MSEARCH_HEADER_PARAMS:
+                if key in search:
+                    header[key] = search.pop(key)
+            for key in TRANSPORT_PARAMS:
+                if key in search:
+                    transport[key] = search.pop(key)
+            for key, body_key in MSEARCH_BODY_PARAMS.items():
+                if key in search:
+                    search[body_key] = search.pop(key)
+            if isinstance(search.get("_source"), str):  # comma separated url param
+                search["_source"] = search["_source"].split(",")
+            search.update(fix_query(query))
+            body.append(header)
+            body.append(search)
+            parse_resources.append(resources[0])
+
+        if not body:
+            return []
+
+        responses = self.elastic(parse_resources[0]).msearch(body=body, **transport)[
+            "responses"
+        ]
+        cursors = []
+        for resource, hits in zip(parse_resources, responses):
+            if hits.get("error"):
+                status = hits.get("status", 500)
+                error = hits["error"]
+                if isinstance(error, dict):
+                    error = error.get("type")
+                exception = elasticsearch.exceptions.HTTP_EXCEPTIONS.get(
+                    status, elasticsearch.TransportError
+                )
+                raise exception(status, error, hits)
+            cursors.append(self._parse_hits(hits, resource))
+        return cursors
 
     def reindex(self, resource, *, requests_per_second=1000):  # noqa: F811
         es = self.elastic(resource)
@@ -1075,13 +1579,17 @@ class Elastic(DataLayer):
             try:
                 es.indices.get(index=alias)
                 print("Old index is not using an alias.")
-                _background_reindex(
-                    es,
-                    alias,
-                    new_index,
-                    requests_per_second=requests_per_second,
-                    refresh=True,
-                )
+                self._set_bulk_indexing_mode(es, new_index, True)
+                try:
+                    _background_reindex(
+                        es,
+                        alias,
+                        new_index,
+                        requests_per_second=requests_per_second,
+                        refresh=True,
+                    )
+                finally:
+                    self._set_bulk_indexing_mode(es, new_index, False, settings)
                 es.indices.update_aliases(
                     body={
                         "actions": [
@@ -1133,9 +1641,13 @@ class Elastic(DataLayer):
             }
         )
 
-        _background_reindex(
-            es, old_index, new_index, requests_per_second=requests_per_second
-        )
+        self._set_bulk_indexing_mode(es, new_index, True)
+        try:
+            _background_reindex(
+                es, old_index, new_index, requests_per_second=requests_per_second
+            )
+        finally:
+            self._set_bulk_indexing_mode(es, new_index, False, settings)
 
         # add new index is writable, tmp readonly
         es.indices.update_aliases(
@@ -1185,6 +1697,7 @@ def _background_reindex(
             "dest": {"index": new_index, "version_type": "external"},
         },
         requests_per_second=requests_per_second,
+        slices="auto",
         wait_for_completion=False,
         refresh=refresh,
     )
@@ -1283,21 +1796,68 @@ def build_elastic_query(doc):
                 It's the developer responsibility to pass right object.
     :returns ElasticSearch query
     """
-    elastic_query, filters = {"query": {"bool": {"must": []}}}, []
+    if len(doc) == 1 and "q" in doc:
+        return {"query": {"bool": {"must": [_build_query_string(doc["q"])]}}}
 
-    for key in doc.keys():
-        if key == "q":
-            elastic_query["query"]["bool"]["must"].append(_build_query_string(doc["q"]))
-        else:
-            _value = doc[key]
-            filters.append(
-                {"terms": {key: _value}}
-                if isinstance(_value, list)
-                else {"term": {key: _value}}
+    bool_query = {"must": [_build_query_string(doc["q"])]} if "q" in doc else {}
+
+    # keep filters in canonical order so same queries can hit elastic caches
+    filters = [
+        (
+            {"terms": {key: sorted(value, key=str)}}
+            if type(value) is list
+            else {"term": {key: value}}
+        )
+        for key, value in sorted(doc.items())
+        if key != "q"
+    ]
+    if filters:
+        bool_query["filter"] = filters
+
+    return {"query": {"bool": bool_query}}
+
+
+def build_elastic_query_bulk(queries):
+    """Build msearch body for multiple docs using :func:`build_elastic_query`.
+
+    :param queries: iterable of ``(index, doc)`` tuples, index can be a list of indexes
+    :returns: NDJSON body as bytes which can be passed to elastic ``msearch``
+    """
+    dumps = ElasticJSONSerializer().dumps
+    lines = []
+    for index, doc in queries:
+        lines.append(dumps({"index": index}).encode("utf-8"))
+        key = _doc_key(doc)
+        try:
+            lines.append(_build_elastic_query_bytes(key))
+        except TypeError:  # unhashable value
+            lines.append(dumps(build_elastic_query(doc)).encode("utf-8"))
+    lines.append(b"")
+    return b"\n".join(lines)
+
+
+def _doc_key(doc):
+    """Get hashable projection of doc, value types are kept so 1 and True differ."""
+    return tuple(
+        sorted(
+            (
+                (key, True, tuple((type(v), v) for v in value))
+                if type(value) is list
+                else (key, False, ((type(value), value),))
             )
+            for key, value in doc.items()
+        )
+    )
+
 
-    set_filters(elastic_query, filters)
-    return elastic_query
+@lru_cache(maxsize=1024)
+def _build_elastic_query_bytes(key):
+    """Get serialized :func:`build_elastic_query` body for doc key."""
+    doc = {
+        name: [v for _, v in values] if is_list else values[0][1]
+        for name, is_list, values in key
+    }
+    return ElasticJSONSerializer().dumps(build_elastic_query(doc)).encode("utf-8")
 
 
 def _build_query_string(q, default_field=None, default_operator="AND"):
@@ -1308,29 +1868,29 @@ def _build_query_string(q, default_field=None, default_operator="AND"):
     :param default_field: default_field
     :return: dictionary object.
     """
-
-    def _is_phrase_search(query_string):
-        clean_query = query_string.strip()
-        return clean_query and clean_query.startswith('"') and clean_query.endswith('"')
-
-    def _get_phrase(query_string):
-        return query_string.strip().strip('"')
-
-    if _is_phrase_search(q) and default_field:
-        query = {"match_phrase": {default_field: _get_phrase(q)}}
+    clean_query = q.strip() if default_field else ""
+    if clean_query and clean_query[0] == '"' and clean_query[-1] == '"':
+        query = {"match_phrase": {default_field: clean_query.strip('"')}}
     else:
-        query = {
-            "query_string": {
-                "query": q,
-                "default_operator": default_operator,
-                "lenient": True,
-            }
+        query_string = {
+            "query": q,
+            "default_operator": default_operator,
+            "lenient": True,
         }
         if default_field:
-            query["query_string"]["default_field"] = default_field
+            query_string["default_field"] = default_field
+        query = {"query_string": query_string}
 
     return query
 
 
 def _build_lookup_filter(lookup):
     return [{"term": {key: val}} for key, val in lookup.items()]
+
+
+def _build_lookup_query(lookup):
+    """Build query matching all lookup values, single term is used as is."""
+    if len(lookup) == 1:
+        for key, val in lookup.items():
+            return {"term": {key: val}}
+    return {"bool": {"must": _build_lookup_filter(lookup)}}
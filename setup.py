@@ -26,6 +26,7 @@ setup(
         "pytz>=2015.4",
         "elasticsearch>=7.0,<8.0",
     ],
+    extras_require={"orjson": ["orjson>=3.0"]},
     classifiers=[
         "Development Status :: 4 - Beta",
         "Environment :: Web Environment",
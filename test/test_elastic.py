@@ -5,15 +5,32 @@ import time
 import pytest
 import elasticsearch
 
-from unittest import TestCase, skip
+from unittest import TestCase, skip, skipIf
 from datetime import datetime
 from copy import deepcopy
 from flask import json
 from eve.utils import config, ParsedRequest, parse_request
-from eve_elastic.elastic import parse_date, Elastic, get_es, generate_index_name
+from bson import ObjectId
+from elasticsearch.helpers import BulkIndexError
+from eve_elastic.elastic import (
+    parse_date,
+    Elastic,
+    ElasticCursor,
+    ElasticJSONSerializer,
+    build_elastic_query,
+    build_elastic_query_bulk,
+    get_es,
+    generate_index_name,
+    test_settings_contain as settings_contain,
+)
 
 from unittest.mock import MagicMock, patch
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def highlight_callback(query_string):
     elastic_highlight_query = {
@@ -160,6 +177,17 @@ class TestElastic(TestCase):
         self.assertIsInstance(date, datetime)
         self.assertEqual("07:56+0000", date.strftime("%H:%M%z"))
 
+    def test_parse_date_formats(self):
+        for date_str in (
+            "2012-10-10T11:12:13Z",
+            "2012-10-10T11:12:13+0000",
+            "2012-10-10T11:12:13.000+00:00",
+            ["2012-10-10T11:12:13+0000"],
+        ):
+            date = parse_date(date_str)
+            self.assertIsInstance(date, datetime)
+            self.assertEqual("2012-10-10 11:12+0000", date.strftime("%Y-%m-%d %H:%M%z"))
+
     def test_parse_date_with_null(self):
         date = parse_date(None)
         self.assertIsNone(date)
@@ -204,6 +232,120 @@ class TestElastic(TestCase):
             self.assertIsInstance(item["firstcreated"], datetime)
             self.assertIsInstance(item["published"], datetime)
 
+    def test_parse_hits_schema_cache(self):
+        def parse_hit():
+            hit = {
+                "_id": "foo",
+                "_source": {
+                    "_resource": "archived_items",
+                    "name": "2012-10-10T11:12:13+0000",
+                },
+            }
+            cursor = self.app.data._parse_hits(
+                {"hits": {"hits": [hit]}}, "archived_items"
+            )
+            return cursor.first()
+
+        with self.app.app_context():
+            self.assertIsInstance(parse_hit()["name"], str)
+
+            self.app.config["DOMAIN"] = deepcopy(self.app.config["DOMAIN"])
+            self.app.config["DOMAIN"]["archived_items"]["schema"]["name"] = {
+                "type": "datetime"
+            }
+            self.assertIsInstance(parse_hit()["name"], str)
+
+            self.app.data.invalidate_schema_cache()
+            self.assertIsInstance(parse_hit()["name"], datetime)
+
+    def test_lazy_dates(self):
+        self.app.config["ELASTICSEARCH_LAZY_DATES"] = True
+        with self.app.app_context():
+            self.app.data.insert(
+                "items", [{"uri": "foo", "firstcreated": "2012-10-10T11:12:13+0000"}]
+            )
+            item = self.app.data.find_one("items", req=None, uri="foo")
+            self.assertIsInstance(item["firstcreated"], str)
+            self.assertIsInstance(item[config.LAST_UPDATED], datetime)
+            self.assertIsInstance(item[config.DATE_CREATED], datetime)
+
+        with self.app.test_client() as c:
+            response = c.get("items")
+            self.assertEqual(200, response.status_code)
+            data = json.loads(response.data)
+            self.assertEqual(1, len(data["_items"]))
+            self.assertEqual("foo", data["_items"][0]["uri"])
+
+            response = c.get("items/{}".format(item["_id"]))
+            self.assertEqual(200, response.status_code)
+
+    def test_insert_multiple_docs(self):
+        with self.app.app_context():
+            with patch.object(self.app.data.elastic("items"), "index") as index:
+                ids = self.app.data.insert(
+                    "items", [{"uri": "foo"}, {"_id": "bar", "uri": "bar"}]
+                )
+            index.assert_not_called()
+            self.assertEqual(2, len(ids))
+            self.assertIsNotNone(ids[0])
+            self.assertEqual("bar", ids[1])
+
+            cursor, count = self.app.data.find("items", ParsedRequest(), None)
+            self.assertEqual(2, count)
+
+    def test_insert_multiple_docs_with_index_args(self):
+        with self.app.app_context():
+            self.app.data.insert(
+                "items", [{"_id": "foo", "uri": "foo"}, {"uri": "bar"}]
+            )
+            with self.assertRaises(BulkIndexError):
+                self.app.data.insert(
+                    "items",
+                    [{"_id": "foo", "uri": "foo"}, {"_id": "baz", "uri": "baz"}],
+                    op_type="create",
+                )
+
+            ids = self.app.data.insert(
+                "items",
+                [{"_id": "v1", "uri": "v1"}, {"_id": "v2", "uri": "v2"}],
+                version=3,
+                version_type="external",
+            )
+            self.assertEqual(["v1", "v2"], ids)
+            cursor, count = self.app.data.find("items", ParsedRequest(), None)
+            self.assertEqual(5, count)
+
+    def test_insert_multiple_docs_keeps_ids_on_error(self):
+        with self.app.app_context():
+            docs = [{"_id": "foo", "uri": "foo"}, {"_id": "bar", "uri": "bar"}]
+            with patch.object(
+                self.app.data.elastic("items"),
+                "bulk",
+                side_effect=elasticsearch.ConnectionError("error"),
+            ):
+                with self.assertRaises(elasticsearch.ConnectionError):
+                    self.app.data.insert("items", docs)
+            self.assertEqual(["foo", "bar"], [doc["_id"] for doc in docs])
+
+    def test_clear_resource_caches(self):
+        with self.app.app_context():
+            self.assertEqual(INDEX + "_items", self.app.data._resource_index("items"))
+            self.app.config["ELASTICSEARCH_INDEXES"] = {"items": "foo_items"}
+            self.assertEqual(INDEX + "_items", self.app.data._resource_index("items"))
+            self.app.data.clear_resource_caches()
+            self.assertEqual("foo_items", self.app.data._resource_index("items"))
+
+    def test_cursor_parses_docs_on_access(self):
+        parse = MagicMock(side_effect=lambda hit: hit["_source"])
+        cursor = ElasticCursor(
+            {"hits": {"total": 1, "hits": [{"_source": {"uri": "foo"}}]}}, parse=parse
+        )
+        self.assertEqual(1, cursor.count())
+        parse.assert_not_called()
+        self.assertEqual([{"uri": "foo"}], list(cursor))
+        self.assertEqual("foo", cursor.first()["uri"])
+        self.assertEqual(1, parse.call_count)
+
     def test_bulk_insert(self):
         with self.app.app_context():
             (count, _errors) = self.app.data.bulk_insert(
@@ -233,6 +375,55 @@ class TestElastic(TestCase):
             self.assertEquals(3, count)
             self.assertEquals(0, len(_errors))
 
+    def test_bulk_insert_without_refresh(self):
+        with self.app.app_context():
+            self.app.config["ELASTICSEARCH_BULK_REFRESH"] = False
+            self.app.config["ELASTICSEARCH_BULK_CHUNK_SIZE"] = 1
+            with patch.object(self.app.data, "_refresh_resource_index") as refresh:
+                (count, _errors) = self.app.data.bulk_insert(
+                    "items", [{"uri": "foo"}, {"uri": "bar"}]
+                )
+            self.assertEqual(2, count)
+            refresh.assert_not_called()
+
+    def test_bulk_insert_parallel(self):
+        with self.app.app_context():
+            self.app.config["ELASTICSEARCH_BULK_CHUNK_SIZE"] = 1
+            self.app.config["ELASTICSEARCH_BULK_THREADS"] = 2
+            (count, _errors) = self.app.data.bulk_insert(
+                "items", [{"uri": "foo"}, {"uri": "bar"}, {"uri": "baz"}]
+            )
+            self.assertEqual(3, count)
+            self.assertEqual(0, len(_errors))
+
+            cursor, count = self.app.data.find("items", ParsedRequest(), None)
+            self.assertEqual(3, count)
+
+    def test_bulk_indexing_mode(self):
+        with self.app.app_context():
+            self.app.data.set_bulk_indexing_mode("items")
+            settings = self.app.data.get_settings("items")["settings"]["index"]
+            self.assertEqual("-1", settings["refresh_interval"])
+            self.assertEqual("0", settings["number_of_replicas"])
+
+            self.app.data.set_bulk_indexing_mode("items", False)
+            settings = self.app.data.get_settings("items")["settings"]["index"]
+            self.assertNotIn("refresh_interval", settings)
+            self.assertEqual("1", settings["number_of_replicas"])
+
+    def test_bulk_indexing_mode_restores_configured_settings(self):
+        with self.app.app_context():
+            self.app.data.set_bulk_indexing_mode("items")
+            self.app.data._bulk_indexing_settings.clear()  # enabled in other process
+
+            self.app.config["ELASTICSEARCH_SETTINGS"] = {
+                "settings": {"index": {"refresh_interval": "5s"}}
+            }
+            self.app.data.set_bulk_indexing_mode("items", False)
+            settings = self.app.data.get_settings("items")["settings"]["index"]
+            self.assertEqual("5s", settings["refresh_interval"])
+            self.assertEqual("1", settings["number_of_replicas"])
+
     def test_query_filter_with_filter_dsl_and_schema_filter(self):
         with self.app.app_context():
             self.app.data.insert(
@@ -726,6 +917,59 @@ class TestElastic(TestCase):
             cursor, count = self.app.data.find("items", req, None)
             self.assertEquals(0, cursor.count())
 
+    def test_build_elastic_query(self):
+        query_string = {
+            "query_string": {"query": "foo", "default_operator": "AND", "lenient": True}
+        }
+        self.assertEqual(
+            {"query": {"bool": {"must": [query_string]}}},
+            build_elastic_query({"q": "foo"}),
+        )
+        self.assertEqual(
+            {
+                "query": {
+                    "bool": {
+                        "must": [query_string],
+                        "filter": [
+                            {"term": {"name": "item"}},
+                            {"terms": {"uri": ["bar", "foo"]}},
+                        ],
+                    }
+                }
+            },
+            build_elastic_query({"uri": ["foo", "bar"], "q": "foo", "name": "item"}),
+        )
+        self.assertEqual(
+            {"query": {"bool": {"filter": [{"term": {"uri": "foo"}}]}}},
+            build_elastic_query({"uri": "foo"}),
+        )
+
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo"}, {"uri": "bar"}])
+            cursor = self.app.data.search(build_elastic_query({"uri": "foo"}), "items")
+            self.assertEqual(1, cursor.count())
+
+    def test_build_elastic_query_bulk(self):
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo"}, {"uri": "bar"}])
+            index = self.app.data._resource_index("items")
+            body = build_elastic_query_bulk(
+                [(index, {"uri": "foo"}), ([index], {"uri": ["foo", "bar"]})]
+            )
+            self.assertIsInstance(body, bytes)
+            self.assertTrue(body.endswith(b"\n"))
+            responses = self.app.data.elastic("items").msearch(body=body)["responses"]
+            self.assertEqual(1, responses[0]["hits"]["total"]["value"])
+            self.assertEqual(2, responses[1]["hits"]["total"]["value"])
+
+    def test_build_elastic_query_bulk_cache(self):
+        self.assertNotEqual(
+            build_elastic_query_bulk([("items", {"public": True})]),
+            build_elastic_query_bulk([("items", {"public": 1})]),
+        )
+        body = build_elastic_query_bulk([("items", {"place": {"code": "x"}})])
+        self.assertIn(b'{"term":{"place":{"code":"x"}}}', body)
+
     def test_elastic_filter_callback(self):
         with self.app.app_context():
             self.app.data.insert(
@@ -805,6 +1049,23 @@ class TestElastic(TestCase):
             cursor, count = self.app.data.find("items", req, None)
             self.assertEqual(2, cursor.count())
 
+    def test_no_force_refresh_on_update(self):
+        with self.app.app_context():
+            self.app.config["ELASTICSEARCH_FORCE_REFRESH"] = False
+            ids = self.app.data.insert("items", [{"uri": "foo", "name": "foo"}])
+            with patch.object(
+                self.app.data.elastic("items").indices, "refresh"
+            ) as refresh:
+                self.app.data.update("items", ids[0], {"name": "bar"})
+                self.app.data.replace("items", ids[0], {"uri": "foo", "name": "baz"})
+                refresh.assert_not_called()
+                self.app.data.refresh_index("items")
+                refresh.assert_called_once()
+
+            with patch.object(self.app.data.elastic("items"), "update") as update:
+                self.app.data.update("items", ids[0], {"name": "bar"})
+                self.assertNotIn("refresh", update.call_args[1])
+
     def test_elastic_prefix(self):
         with self.app.app_context():
             mapping = self.app.data.get_mapping("items_foo")["mappings"]["properties"]
@@ -856,6 +1117,106 @@ class TestElastic(TestCase):
             docs = self.app.data.search({}, "items,archived_items")
             self.assertEqual(2, docs.count())
 
+    def test_msearch(self):
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo", "name": "item"}])
+            self.app.data.insert("archived_items", [{"name": "archived"}])
+
+            items, both = self.app.data.msearch(
+                [
+                    ("items", {"query": {"term": {"uri": "foo"}}}),
+                    ("items,archived_items", {}, {"size": 1}),
+                ]
+            )
+            self.assertEqual(1, items.count())
+            self.assertEqual("foo", items.first()["uri"])
+            self.assertEqual(2, both.count())
+            self.assertEqual(1, len(both.docs))
+
+    def test_msearch_params(self):
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo"}, {"uri": "bar"}])
+
+            es = self.app.data.elastic("items")
+            with patch.object(es, "msearch", wraps=es.msearch) as msearch:
+                (items,) = self.app.data.msearch(
+                    [
+                        (
+                            "items",
+                            {},
+                            {
+                                "from_": 1,
+                                "request_timeout": 30,
+                                "_source": "uri,_resource",
+                            },
+                        )
+                    ]
+                )
+            body = msearch.call_args[1]["body"]
+            self.assertEqual(1, body[1]["from"])
+            self.assertEqual(["uri", "_resource"], body[1]["_source"])
+            self.assertNotIn("from_", body[1])
+            self.assertNotIn("request_timeout", body[1])
+            self.assertEqual(30, msearch.call_args[1]["request_timeout"])
+            self.assertEqual(2, items.count())
+            self.assertEqual(1, len(items.docs))
+
+            with self.assertRaises(ValueError):
+                self.app.data.msearch([("items", {}, {"_source_includes": "uri"})])
+
+    def test_batched_search(self):
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo", "name": "item"}])
+            self.app.data.insert("archived_items", [{"name": "archived"}])
+
+            with patch.object(
+                self.app.data, "msearch", wraps=self.app.data.msearch
+            ) as msearch:
+                with self.app.data.batched():
+                    items = self.app.data.search(
+                        {"query": {"term": {"uri": "foo"}}}, "items"
+                    )
+                    both = self.app.data.search({}, "items,archived_items")
+                    paged = self.app.data.search(
+                        {}, "items,archived_items", {"from_": 1}
+                    )
+                    sorted_ = self.app.data.search(
+                        {}, "items,archived_items", {"sort": "_id:asc"}
+                    )
+                    self.assertEqual(2, sorted_.count())
+                    with self.assertRaises(RuntimeError):
+                        items.count()
+                    with self.assertRaises(RuntimeError):
+                        items.first()
+                self.assertEqual(1, msearch.call_count)
+
+            self.assertEqual(1, items.count())
+            self.assertEqual("foo", items.first()["uri"])
+            self.assertEqual(1, len(items.docs))
+            self.assertEqual(2, both.count())
+            self.assertEqual(2, paged.count())
+            self.assertEqual(1, len(paged.docs))
+
+    def test_batched_search_copies_query(self):
+        with self.app.app_context():
+            self.app.data.insert("items", [{"uri": "foo"}, {"uri": "bar"}])
+
+            es = self.app.data.elastic("items")
+            query = {"query": {"match_all": {}}, "size": 1}
+            params = {"from_": 0}
+            with patch.object(es, "msearch", wraps=es.msearch) as msearch:
+                with self.app.data.batched():
+                    first = self.app.data.search(query, "items", params)
+                    query["size"] = 2
+                    params["from_"] = 1
+                    second = self.app.data.search(query, "items", params)
+
+            body = msearch.call_args[1]["body"]
+            self.assertEqual((1, 0), (body[1]["size"], body[1]["from"]))
+            self.assertEqual((2, 1), (body[3]["size"], body[3]["from"]))
+            self.assertEqual(1, len(first.docs))
+            self.assertEqual(1, len(second.docs))
+
     def test_bulk_insert_with_version(self):
         with self.app.app_context():
             self.app.data.bulk_insert(
@@ -918,6 +1279,24 @@ class TestElastic(TestCase):
 
             assert es.indices.exists_alias(alias)
 
+    def test_reindex_error_restores_settings(self):
+        resource = "items"
+        with self.app.app_context():
+            elastic = self.app.data
+            es = elastic.elastic(resource)
+
+            with patch(
+                "eve_elastic.elastic._background_reindex",
+                side_effect=elasticsearch.TransportError(500, "error"),
+            ) as background_reindex:
+                with self.assertRaises(elasticsearch.TransportError):
+                    elastic.reindex(resource)
+
+            new_index = background_reindex.call_args[0][2]
+            settings = es.indices.get_settings(index=new_index)[new_index]
+            self.assertNotIn("refresh_interval", settings["settings"]["index"])
+            self.assertEqual("1", settings["settings"]["index"]["number_of_replicas"])
+
 
 class TestElasticSearchWithSettings(TestCase):
     resource = "items"
@@ -1038,6 +1417,63 @@ class TestElasticSearchWithSettings(TestCase):
         es = get_es("http://localhost:9200", serializer=TestSerializer())
         self.assertIsInstance(es.transport.serializer, TestSerializer)
 
+    def test_serializer(self):
+        serializer = ElasticJSONSerializer()
+        _id = ObjectId()
+        data = serializer.loads(
+            serializer.dumps({"_id": _id, "created": datetime(2012, 10, 10, 11, 12)})
+        )
+        self.assertEqual(str(_id), data["_id"])
+        self.assertEqual("2012-10-10T11:12:00", data["created"])
+        self.assertEqual(datetime(2012, 10, 10, 11, 12), parse_date(data["created"]))
+        self.assertEqual("raw", serializer.dumps("raw"))
+        with self.assertRaises(elasticsearch.SerializationError):
+            serializer.loads("{foo")
+
+    def test_serializer_fallback(self):
+        serializer = ElasticJSONSerializer()
+        self.assertEqual(
+            '{"big":1180591620717411303424}', serializer.dumps({"big": 2**70})
+        )
+        with self.assertRaises(elasticsearch.SerializationError):
+            serializer.dumps({"foo": object()})
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_serializer_nan(self):
+        serializer = ElasticJSONSerializer()
+        self.assertEqual(
+            '{"nan":null,"inf":null}',
+            serializer.dumps({"nan": float("nan"), "inf": float("inf")}),
+        )
+
+
+class TestSettingsContain(TestCase):
+    def test_missing_key(self):
+        self.assertFalse(settings_contain({"foo": 1}, {"bar": 1}))
+
+    def test_scalar_vs_dict(self):
+        self.assertFalse(settings_contain({"foo": "1"}, {"foo": {"bar": 1}}))
+
+    def test_empty_new(self):
+        self.assertTrue(settings_contain({"foo": 1}, {}))
+        self.assertTrue(settings_contain({"foo": 1}, None))
+
+    def test_nested_match(self):
+        current = {"analysis": {"analyzer": {"foo": {"type": "custom"}}}, "bar": 1}
+        self.assertTrue(
+            settings_contain(current, {"analysis": {"analyzer": {"foo": {}}}})
+        )
+        self.assertTrue(
+            settings_contain(
+                current, {"analysis": {"analyzer": {"foo": {"type": "custom"}}}}
+            )
+        )
+        self.assertFalse(
+            settings_contain(
+                current, {"analysis": {"analyzer": {"foo": {"type": "keyword"}}}}
+            )
+        )
+
 
 @skip("no parent/child join between indexes")
 class TestElasticSearchParentChild(TestCase):